@@ -1,23 +1,77 @@
+import asyncio
+
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
+from urllib3.util.retry import Retry
+
+# Shared session so repeated calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "Mozilla/5.0"})
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(total=3, backoff_factor=0.2)),
+)
 
 
 def scrape_example():
-    """Fetches the HTML content of example.com"""
+    """Fetches the raw HTML bytes of example.com"""
     url = "https://example.com"
-    headers = {"User-Agent": "Mozilla/5.0"}
 
     try:
-        response = requests.get(url, headers=headers, timeout=5)
+        response = _SESSION.get(url, timeout=5)
         response.raise_for_status()
     except requests.RequestException as e:
         print("Request failed:", e)
-        return ""
+        return b""
+
+    # Raw bytes skip requests' charset detection; parse_titles decodes them
+    return response.content
+
+
+def parse_titles(html):
+    """Extracts heading and link text from an HTML document (str or bytes)"""
+    # Detect the encoding of byte input (honouring <meta charset>) instead of
+    # assuming UTF-8
+    tree = LexborHTMLParser(html, encoding=True)
+    return [node.text(strip=True) for node in tree.css("h1, h2, a")]
+
+
+async def scrape_many_async(urls):
+    """Fetches several URLs concurrently over a shared HTTP/2 client"""
+    async with httpx.AsyncClient(
+        timeout=5,
+        headers={"User-Agent": "Mozilla/5.0"},
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        ),
+    ) as client:
+        responses = await asyncio.gather(
+            *[client.get(url) for url in urls], return_exceptions=True
+        )
+
+    results = []
+    for url, response in zip(urls, responses):
+        if isinstance(response, Exception):
+            print("Request failed:", url, response)
+            results.append(b"")
+        elif response.is_error:
+            print("Request failed:", url, response.status_code)
+            results.append(b"")
+        else:
+            results.append(response.content)
+    return results
+
 
-    return response.text
+def scrape_many(urls):
+    """Synchronous wrapper around scrape_many_async"""
+    return asyncio.run(scrape_many_async(urls))
 
 
 # Example usage
 if __name__ == "__main__":
     data = scrape_example()
-    print("Scraper results:", data)
+    print("Scraper results:", data.decode("utf-8", errors="replace"))
@@ -1,8 +1,38 @@
 # tests/test_scraper.py
-from app.scraper import scrape_example
+import httpx
+import responses
+import respx
 
+from app.scraper import parse_titles, scrape_example, scrape_many
+
+
+@responses.activate
 def test_scraper_basic():
-    results = scrape_example()  # no argument now
+    responses.add(responses.GET, "https://example.com", body="<html><h1>x</h1></html>", status=200)
+    results = scrape_example()
     print("Scraper results:", results)
-    assert isinstance(results, list)
-    assert len(results) > 0
+    assert isinstance(results, bytes)
+    assert b"<h1>" in results
+
+
+def test_parse_titles_honours_meta_charset():
+    html = (
+        '<html><head><meta charset="iso-8859-1"></head>'
+        "<body><h1>Caf\u00e9 cr\u00e8me</h1></body></html>"
+    ).encode("latin-1")
+    assert parse_titles(html) == ["Caf\u00e9 cr\u00e8me"]
+
+
+def test_parse_titles_extracts_headings_and_links():
+    html = b"<html><body><h1> Title </h1><p>skip</p><h2>Sub</h2><a href='/x'>Link</a></body></html>"
+    assert parse_titles(html) == ["Title", "Sub", "Link"]
+
+
+@respx.mock
+def test_scrape_many_keeps_order_and_blanks_failures():
+    respx.get("https://ok.example").respond(200, content=b"<h1>ok</h1>")
+    respx.get("https://down.example").respond(503)
+    respx.get("https://unreachable.example").mock(side_effect=httpx.ConnectError("refused"))
+
+    results = scrape_many(["https://ok.example", "https://down.example", "https://unreachable.example"])
+    assert results == [b"<h1>ok</h1>", b"", b""]
@@ -1,24 +1,25 @@
 #!/usr/bin/env python3
 import os
 import argparse
+import asyncio
+import json
+import shutil
 import subprocess
 import sys
 import time
-from azure.identity import ClientSecretCredential
-from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.storage import StorageManagementClient
-from azure.mgmt.containerregistry import ContainerRegistryManagementClient
-from azure.mgmt.containerinstance import ContainerInstanceManagementClient
-from azure.mgmt.containerinstance.models import (
-    Container, ContainerGroup, ContainerPort, ResourceRequests,
-    ResourceRequirements, OperatingSystemTypes, ImageRegistryCredential
-)
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
 
+# Azure SDK, requests and websockets imports are deferred to the functions
+# that need them so each subcommand only pays for the packages it uses.
+
 load_dotenv()
 RESOURCE_TAG = {"blazetest": "true"}
+STATE_FILE = ".blazetest-state.json"
 
 
+@lru_cache(maxsize=1)
 def get_credentials():
     client_id = os.getenv("AZURE_CLIENT_ID")
     client_secret = os.getenv("AZURE_CLIENT_SECRET")
@@ -26,24 +27,115 @@ def get_credentials():
     subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
     if not all([client_id, client_secret, tenant_id, subscription_id]):
         raise Exception("Azure credentials not fully set.")
+    from azure.identity import ClientSecretCredential
+
     credential = ClientSecretCredential(tenant_id, client_id, client_secret)
     return credential, subscription_id
 
 
+@lru_cache(maxsize=1)
+def get_transport():
+    """Shared pooled transport so LRO polling reuses HTTPS connections."""
+    import requests
+    from azure.core.pipeline.transport import RequestsTransport
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=50))
+    return RequestsTransport(session=session, session_owner=False)
+
+
+@lru_cache(maxsize=1)
+def get_resource_client():
+    from azure.mgmt.resource import ResourceManagementClient
+
+    return ResourceManagementClient(*get_credentials(), transport=get_transport())
+
+
+@lru_cache(maxsize=1)
+def get_storage_client():
+    from azure.mgmt.storage import StorageManagementClient
+
+    return StorageManagementClient(*get_credentials(), transport=get_transport())
+
+
+@lru_cache(maxsize=1)
+def get_acr_client():
+    from azure.mgmt.containerregistry import ContainerRegistryManagementClient
+
+    return ContainerRegistryManagementClient(*get_credentials(), transport=get_transport())
+
+
+@lru_cache(maxsize=1)
+def get_aci_client():
+    from azure.mgmt.containerinstance import ContainerInstanceManagementClient
+
+    return ContainerInstanceManagementClient(*get_credentials(), transport=get_transport())
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
 def init():
     print("Verifying Azure credentials...")
-    credential, subscription_id = get_credentials()
-    resource_client = ResourceManagementClient(credential, subscription_id)
-    rgs = list(resource_client.resource_groups.list())
-    print(f"Access verified. Found {len(rgs)} resource groups.")
+    resource_client = get_resource_client()
+    count = sum(1 for _ in resource_client.resource_groups.list())
+    print(f"Access verified. Found {count} resource groups.")
+
+
+async def attach_logs(aci_client, rg_name, container_group_name, container_name):
+    """Print container output pushed over the ACI attach websocket until it closes."""
+    import websockets
+
+    attach = aci_client.containers.attach(rg_name, container_group_name, container_name)
+    async with websockets.connect(attach.web_socket_uri) as ws:
+        await ws.send(attach.password)
+        async for message in ws:
+            if isinstance(message, bytes):
+                message = message.decode("utf-8", errors="replace")
+            print(message, end="", flush=True)
+
+
+def wait_for_completion(aci_client, rg_name, container_group_name):
+    """Poll the container group state with backoff until it finishes."""
+    delay = 1
+    while True:
+        cg = aci_client.container_groups.get(rg_name, container_group_name)
+        if cg.instance_view.state in ["Terminated", "Succeeded", "Failed"]:
+            return
+        time.sleep(delay)
+        delay = min(delay * 1.5, 15)
+
+
+def poll_logs(aci_client, rg_name, container_group_name, container_name):
+    """Wait for the container group to finish, then print its log once."""
+    wait_for_completion(aci_client, rg_name, container_group_name)
+    logs = aci_client.containers.list_logs(rg_name, container_group_name, container_name)
+    print(logs.content or "", end="", flush=True)
 
 
 def run_tests_in_aci(image_name, acr_username, acr_password, registry_login_server):
     """Run pytest inside Azure Container Instance and stream output."""
+    from azure.mgmt.containerinstance.models import (
+        Container, ContainerGroup, ResourceRequests,
+        ResourceRequirements, OperatingSystemTypes, ImageRegistryCredential
+    )
+
     print("[+] Running tests in Azure Container Instance...")
 
-    credential, subscription_id = get_credentials()
-    aci_client = ContainerInstanceManagementClient(credential, subscription_id)
+    aci_client = get_aci_client()
 
     rg_name = "blazetest-rg"
     container_group_name = "blazetest-test-runner"
@@ -80,18 +172,15 @@ def run_tests_in_aci(image_name, acr_username, acr_password, registry_login_serv
     aci_client.container_groups.begin_create_or_update(rg_name, container_group_name, group).result()
     print("[+] Container started. Streaming logs:")
 
-    # Stream logs until container finishes
-    last_log = ""
-    while True:
-        logs = aci_client.containers.list_logs(rg_name, container_group_name, container_name)
-        if logs != last_log:
-            print(logs, end="", flush=True)
-            last_log = logs
-        cg = aci_client.container_groups.get(rg_name, container_group_name)
-        state = cg.instance_view.state
-        if state in ["Terminated", "Succeeded", "Failed"]:
-            break
-        time.sleep(2)
+    # Stream live output over the attach websocket. The stream can close before
+    # the container exits, so still wait for a terminal state before deleting.
+    try:
+        asyncio.run(attach_logs(aci_client, rg_name, container_group_name, container_name))
+    except Exception as e:
+        print(f"\n[!] Attach failed ({e}), showing the full container log instead:")
+        poll_logs(aci_client, rg_name, container_group_name, container_name)
+    else:
+        wait_for_completion(aci_client, rg_name, container_group_name)
 
     # Delete container group after run
     aci_client.container_groups.begin_delete(rg_name, container_group_name).wait()
@@ -99,9 +188,21 @@ def run_tests_in_aci(image_name, acr_username, acr_password, registry_login_serv
 
 
 def setup():
+    """Provision the blazetest resources, build the test image and run it in ACI.
+
+    Besides the service principal settings in .env, this requires the Azure CLI
+    (``az``), logged in with access to AZURE_SUBSCRIPTION_ID, because the image
+    is built remotely with ``az acr build``.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+
+    # On Windows the CLI is az.cmd, which subprocess cannot resolve from a bare "az"
+    az = shutil.which("az")
+    if az is None:
+        raise Exception("Azure CLI ('az') not found; it is required to build the image with ACR Tasks.")
+
     print("Creating Azure resources...")
-    credential, subscription_id = get_credentials()
-    resource_client = ResourceManagementClient(credential, subscription_id)
+    resource_client = get_resource_client()
 
     # Resource Group
     rg_name = "blazetest-rg"
@@ -110,60 +211,82 @@ def setup():
     )
     print(f"[+] Resource Group '{rg_name}' created.")
 
-    # Storage Account
-    storage_client = StorageManagementClient(credential, subscription_id)
-    storage_name = "blazeteststorage" + os.urandom(3).hex()
-    storage_client.storage_accounts.begin_create(
-        rg_name,
-        storage_name,
-        {"location": "eastus", "sku": {"name": "Standard_LRS"}, "kind": "StorageV2", "tags": RESOURCE_TAG},
-    ).result()
-    print(f"[+] Storage Account '{storage_name}' created.")
-
-    # ACR
-    acr_client = ContainerRegistryManagementClient(credential, subscription_id)
-    acr_name = "blazetestacr" + os.urandom(3).hex()
-    registry = acr_client.registries.begin_create(
-        rg_name,
-        acr_name,
-        {"location": "eastus", "sku": {"name": "Basic"}, "admin_user_enabled": True, "tags": RESOURCE_TAG},
-    ).result()
-    print(f"[+] ACR '{acr_name}' created.")
-
-    # Docker Build
-    print("[+] Building Docker image...")
-    app_path = "./pytest_scraper"
-    image_name = f"{registry.login_server}/google-scraper:latest"
-    subprocess.run(["docker", "build", "-t", image_name, app_path], check=True)
-    print("[+] Docker image built successfully.")
-
-    # Docker login
+    # Reuse the Storage Account and ACR from a previous run when they still exist
+    state = load_state()
+    storage_client = get_storage_client()
+    storage_name = state.get("storage_name") or "blazeteststorage" + os.urandom(3).hex()
+    acr_client = get_acr_client()
+    acr_name = state.get("acr_name") or "blazetestacr" + os.urandom(3).hex()
+
+    def ensure_storage():
+        try:
+            storage_client.storage_accounts.get_properties(rg_name, storage_name)
+            return f"[+] Storage Account '{storage_name}' already exists."
+        except ResourceNotFoundError:
+            storage_client.storage_accounts.begin_create(
+                rg_name,
+                storage_name,
+                {"location": "eastus", "sku": {"name": "Standard_LRS"}, "kind": "StorageV2", "tags": RESOURCE_TAG},
+            ).result()
+            return f"[+] Storage Account '{storage_name}' created."
+
+    def ensure_registry():
+        try:
+            registry = acr_client.registries.get(rg_name, acr_name)
+            return registry, f"[+] ACR '{acr_name}' already exists."
+        except ResourceNotFoundError:
+            registry = acr_client.registries.begin_create(
+                rg_name,
+                acr_name,
+                {"location": "eastus", "sku": {"name": "Basic"}, "admin_user_enabled": True, "tags": RESOURCE_TAG},
+            ).result()
+            return registry, f"[+] ACR '{acr_name}' created."
+
+    # Storage Account and ACR are independent, so provision them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        storage_future = executor.submit(ensure_storage)
+        registry_future = executor.submit(ensure_registry)
+        print(storage_future.result())
+        registry, message = registry_future.result()
+        print(message)
+
+    save_state({"storage_name": storage_name, "acr_name": acr_name})
+
+    # ACR credentials used by ACI to pull the image
     acr_credentials = acr_client.registries.list_credentials(rg_name, acr_name)
     acr_username = acr_credentials.username
     acr_password = acr_credentials.passwords[0].value
+
+    # Build the image inside ACR (ACR Tasks) so no layers are pushed from here
+    print("[+] Building Docker image in ACR...")
+    app_path = "./pytest_scraper"
+    image_name = f"{registry.login_server}/google-scraper:latest"
+    _, subscription_id = get_credentials()
     subprocess.run(
-        ["docker", "login", registry.login_server, "-u", acr_username, "-p", acr_password],
+        [
+            az, "acr", "build",
+            "--subscription", subscription_id,
+            "--registry", acr_name,
+            "--image", "google-scraper:latest",
+            app_path,
+        ],
         check=True,
     )
-
-    # Docker push
-    print("[+] Pushing image...")
-    subprocess.run(["docker", "push", image_name], check=True)
-    print("[+] Docker image pushed successfully.")
+    print("[+] Docker image built and pushed successfully.")
 
     # Run tests in ACI
     run_tests_in_aci(image_name, acr_username, acr_password, registry.login_server)
     print("[✔] Setup complete!")
 
 
-def reset():
+def reset(assume_yes=False):
     print("Deleting Azure resources tagged 'blazetest'...")
-    credential, subscription_id = get_credentials()
-    resource_client = ResourceManagementClient(credential, subscription_id)
+    resource_client = get_resource_client()
 
     rgs_to_delete = [
-        rg.name for rg in resource_client.resource_groups.list()
-        if rg.tags and rg.tags.get("blazetest") == "true"
+        rg.name for rg in resource_client.resource_groups.list(
+            filter="tagName eq 'blazetest' and tagValue eq 'true'"
+        )
     ]
 
     if not rgs_to_delete:
@@ -174,19 +297,23 @@ def reset():
     for rg_name in rgs_to_delete:
         print(f" - {rg_name}")
 
-    confirm = input("Proceed with deletion? (y/n): ").lower()
-    if confirm != "y":
-        print("Deletion aborted.")
-        return
+    if not assume_yes:
+        confirm = input("Proceed with deletion? (y/n): ").lower()
+        if confirm != "y":
+            print("Deletion aborted.")
+            return
 
-    for rg_name in rgs_to_delete:
-        resource_client.resource_groups.begin_delete(rg_name).wait()
+    # Start every deletion first, then wait on the pollers
+    pollers = [resource_client.resource_groups.begin_delete(rg_name) for rg_name in rgs_to_delete]
+    for poller, rg_name in zip(pollers, rgs_to_delete):
+        poller.wait()
         print(f"Deleted Resource Group '{rg_name}'.")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Azure automation script")
     parser.add_argument("command", choices=["init", "setup", "reset"])
+    parser.add_argument("--yes", "-y", action="store_true", help="skip the reset confirmation prompt")
     args = parser.parse_args()
 
     if args.command == "init":
@@ -194,7 +321,7 @@ def main():
     elif args.command == "setup":
         setup()
     elif args.command == "reset":
-        reset()
+        reset(assume_yes=args.yes)
 
 
 if __name__ == "__main__":